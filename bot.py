@@ -1,33 +1,55 @@
 import os
-import re
 import nextcord
 import argparse
+import functools
+import itertools
 from nextcord.ext import commands
 from nextcord import SlashOption
 import webcolors
 
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+# Two-digit uppercase hex for every byte value, used by format_hex_color
+_HEX_BYTES = tuple(f"{i:02X}" for i in range(256))
+
 
 def parse_hex_color(color_input: str) -> int | None:
     """Parse a hex color string and return it as an integer."""
     color_input = color_input.strip().lstrip("#")
 
-    if re.match(r"^[0-9A-Fa-f]{6}$", color_input):
-        return int(color_input, 16)
+    length = len(color_input)
+    if length not in (3, 6):
+        return None
+
+    # int() would also accept "0x", signs, underscores and non-ASCII digits
+    if not _HEX_DIGITS.issuperset(color_input):
+        return None
 
-    if re.match(r"^[0-9A-Fa-f]{3}$", color_input):
-        expanded = "".join(c * 2 for c in color_input)
-        return int(expanded, 16)
+    value = int(color_input, 16)
 
-    return None
+    if length == 3:
+        # Expand #RGB to #RRGGBB by repeating each nibble
+        r, g, b = (value >> 8) & 0xF, (value >> 4) & 0xF, value & 0xF
+        return (r * 0x11 << 16) | (g * 0x11 << 8) | (b * 0x11)
+
+    return value
+
+
+# CSS3 color names from webcolors, converted to integers once at import
+try:
+    _CSS3_NAMES = webcolors.names("css3")
+except AttributeError:  # webcolors < 24.6
+    _CSS3_NAMES = webcolors.CSS3_NAMES_TO_HEX
+
+_NAME_TO_INT = {
+    name: int(webcolors.name_to_hex(name).lstrip("#"), 16)
+    for name in _CSS3_NAMES
+}
 
 
 def color_name_to_hex(color_name: str) -> int | None:
-    """Convert a color name to hex integer using webcolors library."""
-    try:
-        hex_value = webcolors.name_to_hex(color_name.lower().strip())
-        return int(hex_value.lstrip("#"), 16)
-    except ValueError:
-        return None
+    """Convert a color name to hex integer using webcolors' CSS3 names."""
+    return _NAME_TO_INT.get(color_name.lower().strip())
 
 
 # Base colors for vague color parsing (HSL-friendly values)
@@ -52,26 +74,32 @@ BASE_COLORS = {
     "black": (0, 0, 0),
 }
 
-# Modifiers that adjust HSL values
+# Modifiers that adjust HSL values, as (h_add, s_mult, l_add)
 MODIFIERS = {
     # Lightness modifiers
-    "light": {"l_add": 20},
-    "pale": {"l_add": 25, "s_mult": 0.6},
-    "pastel": {"l_add": 30, "s_mult": 0.5},
-    "dark": {"l_add": -25},
-    "deep": {"l_add": -20, "s_mult": 1.1},
+    "light": (0, 1.0, 20),
+    "pale": (0, 0.6, 25),
+    "pastel": (0, 0.5, 30),
+    "dark": (0, 1.0, -25),
+    "deep": (0, 1.1, -20),
     # Saturation modifiers
-    "bright": {"s_mult": 1.2, "l_add": 5},
-    "vivid": {"s_mult": 1.3},
-    "muted": {"s_mult": 0.5},
-    "dull": {"s_mult": 0.4},
-    "soft": {"s_mult": 0.6, "l_add": 10},
+    "bright": (0, 1.2, 5),
+    "vivid": (0, 1.3, 0),
+    "muted": (0, 0.5, 0),
+    "dull": (0, 0.4, 0),
+    "soft": (0, 0.6, 10),
     # Combined effects
-    "neon": {"s_mult": 1.4, "l_add": 10},
-    "electric": {"s_mult": 1.3, "l_add": 5},
-    "dusty": {"s_mult": 0.4, "l_add": -5},
-    "warm": {"h_add": 15},
-    "cool": {"h_add": -15},
+    "neon": (0, 1.4, 10),
+    "electric": (0, 1.3, 5),
+    "dusty": (0, 0.4, -5),
+    "warm": (15, 1.0, 0),
+    "cool": (-15, 1.0, 0),
+}
+
+# Every known word mapped to ("base", hsl) or ("modifier", adjustment)
+_TOKENS = {
+    **{name: ("base", hsl) for name, hsl in BASE_COLORS.items()},
+    **{name: ("modifier", adj) for name, adj in MODIFIERS.items()},
 }
 
 
@@ -83,7 +111,9 @@ def hsl_to_rgb(h: float, s: float, l: float) -> tuple[int, int, int]:
 
     c = (1 - abs(2 * l - 1)) * s
     x = c * (1 - abs((h / 60) % 2 - 1))
-    m = l - c / 2
+    # Halving by multiplication is exact; the /60 and /100 divisions are kept
+    # because reciprocal multiplication rounds differently and shifts some colors
+    m = l - c * 0.5
 
     if h < 60:
         r, g, b = c, x, 0
@@ -105,38 +135,46 @@ def hsl_to_rgb(h: float, s: float, l: float) -> tuple[int, int, int]:
     )
 
 
-def parse_vague_color(color_input: str) -> int | None:
-    """
-    Parse vague color descriptions like 'dark red', 'pastel pink', 'light blue'.
-    Returns the color as an integer or None if not recognized.
-    """
-    words = color_input.lower().strip().split()
+# Base colors pre-converted to integers for inputs without modifiers
+BASE_COLORS_RGB = {
+    name: (r << 16) | (g << 8) | b
+    for name, (h, s, l) in BASE_COLORS.items()
+    for r, g, b in [hsl_to_rgb(h, s, l)]
+}
+
+
+def _parse_vague_words(words: list[str]) -> int | None:
+    """Resolve a split, lowercase color description to an integer."""
     if not words:
         return None
 
-    # Find the base color (usually the last word)
-    base_color = None
-    base_hsl = None
-    modifier_words = []
+    if len(words) == 1:
+        return BASE_COLORS_RGB.get(words[0])
 
-    for i, word in enumerate(words):
-        if word in BASE_COLORS:
-            base_color = word
-            base_hsl = list(BASE_COLORS[word])
-            modifier_words = words[:i] + words[i + 1 :]
-            break
+    # Classify each word with a single lookup; exactly one base color is allowed
+    base_hsl = None
+    modifiers = []
+    for word in words:
+        token = _TOKENS.get(word)
+        if token is None:
+            continue
+        kind, values = token
+        if kind == "base":
+            if base_hsl is not None:
+                return None
+            base_hsl = values
+        else:
+            modifiers.append(values)
 
     if base_hsl is None:
         return None
 
-    # Apply all modifiers
+    # Apply all modifiers in the order they were written
     h, s, l = base_hsl
-    for modifier in modifier_words:
-        if modifier in MODIFIERS:
-            adj = MODIFIERS[modifier]
-            h += adj.get("h_add", 0)
-            s *= adj.get("s_mult", 1.0)
-            l += adj.get("l_add", 0)
+    for h_add, s_mult, l_add in modifiers:
+        h += h_add
+        s *= s_mult
+        l += l_add
 
     # Clamp values
     h = h % 360
@@ -148,24 +186,57 @@ def parse_vague_color(color_input: str) -> int | None:
     return (r << 16) | (g << 8) | b
 
 
+# Every "<modifier> <base>" and "<modifier> <modifier> <base>" description,
+# resolved once at import so common inputs are a single dict lookup
+_VAGUE_CACHE = {
+    " ".join(mods) + " " + base: _parse_vague_words([*mods, base])
+    for n_mods in (1, 2)
+    for mods in itertools.permutations(MODIFIERS, n_mods)
+    for base in BASE_COLORS
+}
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_vague_color(color_input: str) -> int | None:
+    """
+    Parse vague color descriptions like 'dark red', 'pastel pink', 'light blue'.
+    Returns the color as an integer or None if not recognized.
+    """
+    color_input = color_input.lower().strip()
+
+    cached = _VAGUE_CACHE.get(color_input)
+    if cached is not None:
+        return cached
+
+    return _parse_vague_words(color_input.split())
+
+
 def get_color_from_input(color_input: str) -> tuple[int | None, str]:
     """
     Parse color input and return (color_int, hex_string).
     Tries hex code first, then exact color name, then vague descriptions.
     """
+    # Normalize first so equivalent inputs share a cache slot
+    return _get_color_from_normalized_input(color_input.strip().lower())
+
+
+@functools.lru_cache(maxsize=1024)
+def _get_color_from_normalized_input(color_input: str) -> tuple[int | None, str]:
+    """Cached worker for get_color_from_input; expects stripped, lowercase input."""
     hex_color = parse_hex_color(color_input)
-    if hex_color is not None:
-        return hex_color, f"#{hex_color:06X}"
+    if hex_color is None:
+        hex_color = color_name_to_hex(color_input)
+    if hex_color is None:
+        hex_color = parse_vague_color(color_input)
+    if hex_color is None:
+        return None, ""
 
-    hex_color = color_name_to_hex(color_input)
-    if hex_color is not None:
-        return hex_color, f"#{hex_color:06X}"
+    return hex_color, format_hex_color(hex_color)
 
-    hex_color = parse_vague_color(color_input)
-    if hex_color is not None:
-        return hex_color, f"#{hex_color:06X}"
 
-    return None, ""
+def format_hex_color(color: int) -> str:
+    """Format a color integer as an uppercase '#RRGGBB' string."""
+    return "#" + _HEX_BYTES[(color >> 16) & 0xFF] + _HEX_BYTES[(color >> 8) & 0xFF] + _HEX_BYTES[color & 0xFF]
 
 
 def get_role_name(hex_string: str) -> str:
@@ -173,22 +244,78 @@ def get_role_name(hex_string: str) -> str:
     return f"color-{hex_string.lstrip('#').upper()}"
 
 
+def get_test_guild_id() -> int | None:
+    """Read TEST_GUILD_ID from the environment; None if unset or not a valid ID."""
+    test_guild_id = os.getenv("TEST_GUILD_ID", "").strip()
+    if test_guild_id.isascii() and test_guild_id.isdigit():
+        return int(test_guild_id)
+    return None
+
+
 class ColorBot(commands.Bot):
     def __init__(self):
         intents = nextcord.Intents.default()
         intents.members = True
         intents.guilds = True
-        super().__init__(intents=intents)
+        # Guild-scoped commands register instantly, unlike global ones, so
+        # development bots can set TEST_GUILD_ID to skip global syncing
+        test_guild_id = get_test_guild_id()
+        super().__init__(
+            intents=intents,
+            default_guild_ids=[test_guild_id] if test_guild_id is not None else None,
+        )
+        # Per-guild {role_name: role} index so /pick avoids scanning guild.roles
+        self._role_cache: dict[int, dict[str, nextcord.Role]] = {}
+        # Added as listeners rather than on_* overrides so nextcord's own event
+        # handlers (e.g. on_guild_available syncing guild commands) still run
+        self.add_listener(self._role_created, "on_guild_role_create")
+        self.add_listener(self._role_updated, "on_guild_role_update")
+        self.add_listener(self._role_deleted, "on_guild_role_delete")
+        self.add_listener(self._guild_changed, "on_guild_available")
+        self.add_listener(self._guild_changed, "on_guild_join")
+        self.add_listener(self._guild_changed, "on_guild_remove")
+
+    @staticmethod
+    def _index_roles(guild: nextcord.Guild) -> dict[str, nextcord.Role]:
+        """Map role names to roles, keeping the lowest-positioned role on name clashes."""
+        return {role.name: role for role in reversed(guild.roles)}
+
+    def get_cached_role(self, guild: nextcord.Guild, name: str) -> nextcord.Role | None:
+        """Look up a role by name, building the guild's index on first use."""
+        roles = self._role_cache.get(guild.id)
+        if roles is None:
+            roles = self._role_cache[guild.id] = self._index_roles(guild)
+        return roles.get(name)
+
+    def _invalidate_roles(self, guild: nextcord.Guild):
+        self._role_cache.pop(guild.id, None)
 
     async def on_ready(self):
+        # Guild objects are recreated on reconnect, so rebuild every index
+        self._role_cache = {guild.id: self._index_roles(guild) for guild in self.guilds}
         print(f"Bot is ready! Logged in as {self.user}")
         print(f"Connected to {len(self.guilds)} guild(s)")
 
+    async def _role_created(self, role: nextcord.Role):
+        self._invalidate_roles(role.guild)
+
+    async def _role_updated(self, before: nextcord.Role, after: nextcord.Role):
+        if before.name != after.name:
+            self._invalidate_roles(after.guild)
+
+    async def _role_deleted(self, role: nextcord.Role):
+        self._invalidate_roles(role.guild)
+
+    async def _guild_changed(self, guild: nextcord.Guild):
+        # Roles are rebuilt from scratch when a guild comes back after an
+        # outage, and events missed while it was unavailable are never replayed
+        self._invalidate_roles(guild)
+
 
 bot = ColorBot()
 
 
-@bot.slash_command(name="pick", description="Pick a color for your name!")
+@bot.slash_command(name="pick", description="Pick a color for your name!", dm_permission=False)
 async def pick_color(
     interaction: nextcord.Interaction,
     color: str = SlashOption(
@@ -211,6 +338,8 @@ async def pick_color(
         )
         return
 
+    # dm_permission=False guarantees a guild Member, but the Guild itself may
+    # still be missing from the cache (e.g. while it is unavailable)
     guild = interaction.guild
     if guild is None:
         await interaction.followup.send(
@@ -220,17 +349,11 @@ async def pick_color(
         return
 
     member = interaction.user
-    if not isinstance(member, nextcord.Member):
-        await interaction.followup.send(
-            "Could not retrieve your member information.",
-            ephemeral=True,
-        )
-        return
 
     role_name = get_role_name(hex_string)
     discord_color = nextcord.Color(color_int)
 
-    existing_role = nextcord.utils.get(guild.roles, name=role_name)
+    existing_role = bot.get_cached_role(guild, role_name)
 
     if existing_role is None:
         try:
@@ -266,31 +389,36 @@ async def pick_color(
             )
             return
 
-    # Remove any existing color roles from the user
-    color_roles_to_remove = [
-        role for role in member.roles
-        if role.name.startswith("color-") and role.name != role_name
-    ]
+    # member.roles[0] is @everyone, which must not be sent back to Discord.
+    current_roles = member.roles[1:]
+    current_color_roles = [role for role in current_roles if role.name.startswith("color-")]
 
-    try:
-        if color_roles_to_remove:
-            await member.remove_roles(*color_roles_to_remove, reason="Switching color")
+    # Skip the role update entirely if the member already wears only this color
+    if current_color_roles != [existing_role]:
+        # Drop any other color roles and add the new one in a single request
+        new_roles = [
+            role for role in current_roles
+            if not (role.name.startswith("color-") and role.name != role_name)
+        ]
+        if existing_role not in new_roles:
+            new_roles.append(existing_role)
 
-        if existing_role not in member.roles:
-            await member.add_roles(existing_role, reason="Color picked by user")
-    except nextcord.Forbidden:
-        await interaction.followup.send(
-            "I don't have permission to manage your roles. "
-            "Please make sure my role is above the color roles.",
-            ephemeral=True,
-        )
-        return
-    except nextcord.HTTPException as e:
-        await interaction.followup.send(
-            f"Failed to assign role: {e}",
-            ephemeral=True,
-        )
-        return
+        try:
+            if new_roles != current_roles:
+                await member.edit(roles=new_roles, reason="Color picked by user")
+        except nextcord.Forbidden:
+            await interaction.followup.send(
+                "I don't have permission to manage your roles. "
+                "Please make sure my role is above the color roles.",
+                ephemeral=True,
+            )
+            return
+        except nextcord.HTTPException as e:
+            await interaction.followup.send(
+                f"Failed to assign role: {e}",
+                ephemeral=True,
+            )
+            return
 
     # Create an embed to show the color
     embed = nextcord.Embed(
@@ -305,9 +433,13 @@ async def pick_color(
     await interaction.followup.send(embed=embed, ephemeral=True)
 
 
-@bot.slash_command(name="help", description="Learn how to use the color picker bot")
-async def help_command(interaction: nextcord.Interaction):
-    """Display help information about the color picker bot."""
+# Base colors shown in /help ("grey" is an alias of "gray")
+_HELP_BASE_COLORS = tuple(sorted(c for c in BASE_COLORS if c != "grey"))
+_HELP_BASE_COLOR_LIST = ", ".join(f"`{c}`" for c in _HELP_BASE_COLORS)
+
+
+def _build_help_embed() -> nextcord.Embed:
+    """Build the /help embed. Its content is static, so it is built once at import."""
     embed = nextcord.Embed(
         title="🎨 Color Wizard Help",
         description="Change your name color with `/pick <color>`!\n\n"
@@ -324,10 +456,9 @@ async def help_command(interaction: nextcord.Interaction):
     )
 
     # Base colors section
-    base_color_list = ", ".join(f"`{c}`" for c in sorted(BASE_COLORS.keys()) if c != "grey")
     embed.add_field(
         name="Base Colors",
-        value=base_color_list,
+        value=_HELP_BASE_COLOR_LIST,
         inline=False,
     )
 
@@ -385,7 +516,16 @@ async def help_command(interaction: nextcord.Interaction):
     # Footer with tip
     embed.set_footer(text="Tip: The bot also recognizes CSS color names like 'coral', 'salmon', 'teal', etc.")
 
-    await interaction.response.send_message(embed=embed, ephemeral=True)
+    return embed
+
+
+_HELP_EMBED = _build_help_embed()
+
+
+@bot.slash_command(name="help", description="Learn how to use the color picker bot")
+async def help_command(interaction: nextcord.Interaction):
+    """Display help information about the color picker bot."""
+    await interaction.response.send_message(embed=_HELP_EMBED, ephemeral=True)
 
 
 @bot.slash_command(name="about", description="Learn about the Color Wizard bot")
@@ -533,6 +673,10 @@ def main():
         print("Error: DISCORD_TOKEN environment variable is not set, or --token argument not provided!")
         print("Please set it in your .env file or environment.")
         exit(1)
+    if os.getenv("TEST_GUILD_ID", "").strip() and get_test_guild_id() is None:
+        print(f"Error: TEST_GUILD_ID must be a numeric server ID, got {os.getenv('TEST_GUILD_ID')!r}")
+        print("Please fix or unset it in your .env file or environment.")
+        exit(1)
 
     bot.run(token)
 